@@ -1,11 +1,19 @@
 import os
 import json
+from functools import lru_cache
+from typing import Any
 
-from dotenv import load_dotenv 
+from dotenv import load_dotenv
 
 load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN", "")
 PROXY_URL = os.getenv("PROXY_URL", "")
 
-COOKIES = json.loads(open("cookies.json", "r", encoding="utf-8").read())
\ No newline at end of file
+COOKIES_PATH = "cookies.json"
+
+
+@lru_cache(maxsize=1)
+def get_cookies() -> Any:
+    with open(COOKIES_PATH, "rb") as f:
+        return json.load(f)
@@ -2,11 +2,11 @@ from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
 
-from utils.db import (
-    get_user_settings,
+from utils.db_async import add_user_if_not_exists
+from utils.settings_cache import (
+    get_cached,
     update_orientation,
     update_duration,
-    add_user_if_not_exists,
     update_size,
 )
 from keyboard.settings_menu import build_settings_keyboard
@@ -14,45 +14,47 @@ from keyboard.settings_menu import build_settings_keyboard
 
 router = Router(name="settings")
 
+SETTINGS_TEXT = "Выберите ориентацию, длительность и качество:"
+
 
 @router.message(Command("settings"))
 @router.message(Command("settigs"))
 async def cmd_settings(message: Message) -> None:
-    add_user_if_not_exists(message.from_user.id)
-    is_vertical, duration_sec, _, size = get_user_settings(message.from_user.id)
+    await add_user_if_not_exists(message.from_user.id)
+    settings = await get_cached(message.from_user.id)
     await message.answer(
-        "Выберите ориентацию, длительность и качество:",
-        reply_markup=build_settings_keyboard(bool(is_vertical), int(duration_sec), str(size)),
+        SETTINGS_TEXT,
+        reply_markup=build_settings_keyboard(settings.is_vertical == 1, settings.duration_sec, settings.size),
     )
 
 
 @router.callback_query(F.data.startswith("set:"))
 async def on_settings_callback(callback: CallbackQuery) -> None:
     user_id = callback.from_user.id
-    is_vertical, duration_sec, _, size = get_user_settings(user_id)
+    settings = await get_cached(user_id)
     data = callback.data or ""
     if data.startswith("set:orient:"):
         value = data.split(":", 2)[2]
         new_is_vertical = 1 if value == "portrait" else 0
-        if new_is_vertical == int(is_vertical):
+        if new_is_vertical == settings.is_vertical:
             await callback.answer()
             return
-        update_orientation(user_id, new_is_vertical)
-        is_vertical = new_is_vertical
+        await update_orientation(user_id, new_is_vertical)
+        settings = settings._replace(is_vertical=new_is_vertical)
         await callback.message.edit_reply_markup(
-            reply_markup=build_settings_keyboard(bool(is_vertical), int(duration_sec), str(size))
+            reply_markup=build_settings_keyboard(settings.is_vertical == 1, settings.duration_sec, settings.size)
         )
         return
 
     if data.startswith("set:dur:" ):
         value = int(data.split(":", 2)[2])
-        if value == int(duration_sec):
+        if value == settings.duration_sec:
             await callback.answer()
             return
-        update_duration(user_id, value)
-        duration_sec = value
+        await update_duration(user_id, value)
+        settings = settings._replace(duration_sec=value)
         await callback.message.edit_reply_markup(
-            reply_markup=build_settings_keyboard(bool(is_vertical), int(duration_sec), str(size))
+            reply_markup=build_settings_keyboard(settings.is_vertical == 1, settings.duration_sec, settings.size)
         )
         return
 
@@ -62,11 +64,11 @@ async def on_settings_callback(callback: CallbackQuery) -> None:
         if value_norm not in ("small", "large"):
             await callback.answer()
             return
-        if value_norm == str(size).lower():
+        if value_norm == settings.size.lower():
             await callback.answer()
             return
-        update_size(user_id, value_norm)
-        size = value_norm
+        await update_size(user_id, value_norm)
+        settings = settings._replace(size=value_norm)
         await callback.message.edit_reply_markup(
-            reply_markup=build_settings_keyboard(bool(is_vertical), int(duration_sec), str(size))
+            reply_markup=build_settings_keyboard(settings.is_vertical == 1, settings.duration_sec, settings.size)
         )
@@ -1,56 +1,94 @@
-from typing import Optional
-from io import BytesIO
+import time
+from typing import Optional, Union
 
 from aiogram import Router, F
 from aiogram.types import Message
 from aiogram.types.input_file import URLInputFile
 
-from utils.db import get_user_settings
+from utils.settings_cache import get_cached
 from utils.sora import SoraClient
 
-from config import PROXY_URL, COOKIES
-
 router = Router(name="video_generation")
 
-client = SoraClient(cookies=COOKIES, proxy=PROXY_URL)
+PROGRESS_EDIT_INTERVAL_SEC = 1.2
+
+QUEUED_TEXT = "⏳ Генерация скоро начнется..."
+PROGRESS_TEXTS = tuple(f"🚀 Видео создается. Прогресс: <b>{i}%</b>" for i in range(101))
+ERROR_TEXT = "<b>🚫 Ошибка генерации:</b>\n<pre>{}</pre>"
+UNKNOWN_STATE_TEXT = ERROR_TEXT.format("Неизвестное состояние")
+
+client: Optional[SoraClient] = None
+
 
-async def _start_generation(message: Message, prompt: str, image_bytes: Optional[bytes] = None) -> None:
+def init(sora_client: SoraClient) -> None:
+    global client
+    client = sora_client
+
+
+async def _send_video(message: Message, url: str) -> None:
+    for video in (url, URLInputFile(url)):
+        try:
+            await message.reply_video(
+                video=video,
+                caption="<b>✅ Видео успешно создано</b>",
+            )
+            return
+        except Exception:
+            continue
+    await message.reply("<b>✅ Видео успешно создано</b>\n\n" + url)
+
+
+async def _start_generation(
+    message: Message,
+    prompt: str,
+    image_bytes: Optional[Union[bytes, memoryview]] = None,
+) -> None:
     user_id = message.from_user.id
 
-    is_vertical, duration_sec, size = get_user_settings(user_id)
+    settings = await get_cached(user_id)
 
     wait_msg: Optional[Message] = None
 
     wait_msg = await message.reply("⏳")
 
-    orientation = "portrait" if int(is_vertical) == 1 else "landscape"
-    duration_i = int(duration_sec)
-    frames = duration_i * 30
+    orientation = "portrait" if settings.is_vertical == 1 else "landscape"
+    frames = settings.duration_sec * 30
+
+    queued_sent = False
+    last_pct = -1
+    last_edit_ts = 0.0
 
     async for evt in client.generate_video(
         prompt=prompt,
         orientation=orientation,
         start_image=image_bytes,
         frames=frames,
-        size=str(size),
+        size=settings.size,
     ):
-        et = str(evt.get("event"))
+        et = evt["event"]
+        status = evt.get("status")
 
-        if et == "queued" or (et == "progress" and evt.get("status") == "queued"):
-            if wait_msg:
+        if et == "queued" or (et == "progress" and status == "queued"):
+            if wait_msg and not queued_sent:
+                queued_sent = True
                 try:
-                    await wait_msg.edit_text("⏳ Генерация скоро начнется...")
+                    await wait_msg.edit_text(QUEUED_TEXT)
                 except Exception:
                     pass
             continue
 
-        if et == "progress" and evt.get("status") == "rendering":
+        if et == "progress" and status == "rendering":
             pct = evt.get("progress_pct")
             if isinstance(pct, (int, float)):
-                pct_i = int(round(float(pct) * 100))
+                pct_i = min(max(int(round(float(pct) * 100)), 0), 100)
+                now = time.monotonic()
+                if pct_i == last_pct or now - last_edit_ts < PROGRESS_EDIT_INTERVAL_SEC:
+                    continue
                 if wait_msg:
+                    last_pct = pct_i
+                    last_edit_ts = now
                     try:
-                        await wait_msg.edit_text(f"🚀 Видео создается. Прогресс: <b>{pct_i}%</b>")
+                        await wait_msg.edit_text(PROGRESS_TEXTS[pct_i])
                     except Exception:
                         pass
             continue
@@ -62,7 +100,7 @@ async def _start_generation(message: Message, prompt: str, image_bytes: Optional
                 except Exception:
                     pass
             err_msg = evt.get("message") or evt.get("code") or "Неизвестная ошибка"
-            await message.reply(f"<b>🚫 Ошибка генерации:</b>\n<pre>{err_msg}</pre>")
+            await message.reply(ERROR_TEXT.format(err_msg))
             return
 
         if et == "finished":
@@ -74,13 +112,7 @@ async def _start_generation(message: Message, prompt: str, image_bytes: Optional
 
             url = evt.get("url")
             if url:
-                try:
-                    await message.reply_video(
-                        video=URLInputFile(url),
-                        caption="<b>✅ Видео успешно создано</b>",
-                    )
-                except Exception as e:
-                    await message.reply("<b>✅ Видео успешно создано</b>\n\n" + url)
+                await _send_video(message, url)
             else:
                 await message.reply("❗️Видео успешно создано, но файл не найден в ответе")
             return
@@ -89,7 +121,7 @@ async def _start_generation(message: Message, prompt: str, image_bytes: Optional
             await wait_msg.delete()
         except Exception:
             pass
-    await message.reply("<b>🚫 Ошибка генерации:</b>\n<pre>Неизвестное состояние</pre>")
+    await message.reply(UNKNOWN_STATE_TEXT)
 
 
 
@@ -110,9 +142,8 @@ async def on_photo(message: Message) -> None:
         return
 
     try:
-        buf = BytesIO()
-        await message.bot.download(message.photo[-1], destination=buf)
-        image_bytes = buf.getvalue()
+        buf = await message.bot.download(message.photo[-1])
+        image_bytes = buf.getbuffer()
     except Exception:
         await message.reply("Не удалось получить фото для генерации.")
         return
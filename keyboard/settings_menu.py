@@ -1,18 +1,30 @@
+from typing import Dict, Tuple
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 
+DURATIONS = (5, 10, 15)
+SIZES = ("small", "large")
+
+_KB_CACHE: Dict[Tuple[bool, int, str], InlineKeyboardMarkup] = {}
+
+
 def _checkmark(selected: bool) -> str:
     return "✅ " if selected else ""
 
 
-def build_settings_keyboard(is_vertical: bool, duration_sec: int, size: str) -> InlineKeyboardMarkup:
+def _normalize_size(size: str) -> str:
+    return "small" if (size or '').lower() == 'small' else "large"
+
+
+def _build_keyboard(is_vertical: bool, duration_sec: int, size: str) -> InlineKeyboardMarkup:
     h_selected = not is_vertical
     v_selected = is_vertical
     d5 = duration_sec == 5
     d10 = duration_sec == 10
     d15 = duration_sec == 15
-    sz_small = (size or '').lower() == 'small'
-    sz_large = (size or '').lower() != 'small'
+    sz_small = size == 'small'
+    sz_large = size != 'small'
 
     row1 = [
         InlineKeyboardButton(
@@ -37,3 +49,22 @@ def build_settings_keyboard(is_vertical: bool, duration_sec: int, size: str) ->
     ]
 
     return InlineKeyboardMarkup(inline_keyboard=[row1, row2, row3])
+
+
+def build_settings_keyboard(is_vertical: bool, duration_sec: int, size: str) -> InlineKeyboardMarkup:
+    key = (is_vertical, duration_sec, _normalize_size(size))
+    cached = _KB_CACHE.get(key)
+    if cached is None:
+        cached = _build_keyboard(*key)
+        _KB_CACHE[key] = cached
+    return cached
+
+
+def _prewarm() -> None:
+    for is_vertical in (False, True):
+        for duration_sec in DURATIONS:
+            for size in SIZES:
+                build_settings_keyboard(is_vertical, duration_sec, size)
+
+
+_prewarm()
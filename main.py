@@ -6,14 +6,18 @@ from aiogram.client.default import DefaultBotProperties
 from aiogram.types import BotCommand
 
 from utils.db import init_db
+from utils.sora import SoraClient
 from handlers.start import router as start_router
 from handlers.settings import router as settings_router
+from handlers import video_generation
 from handlers.video_generation import router as video_router
 
-from config import BOT_TOKEN
+from config import BOT_TOKEN, PROXY_URL, get_cookies
 
 async def main() -> None:
     init_db()
+    sora_client = SoraClient(cookies=get_cookies(), proxy=PROXY_URL)
+    video_generation.init(sora_client)
     bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
     dp = Dispatcher()
 
@@ -22,7 +26,10 @@ async def main() -> None:
     dp.include_router(video_router)
 
     await bot.set_my_commands([BotCommand(command="settings", description="Открыть настройки")])
-    await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+    try:
+        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+    finally:
+        await sora_client.aclose()
 
 
 if __name__ == "__main__":
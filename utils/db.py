@@ -1,15 +1,29 @@
 import os
 import sqlite3
-from typing import Tuple
+import threading
+from pathlib import Path
+from typing import NamedTuple, Set
 
 
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "database.db")
+SCHEMA_VERSION = 1
 
+_KNOWN_USERS: Set[int] = set()
+_tls = threading.local()
 
-def init_db() -> None:
-    conn = sqlite3.connect(DB_PATH)
+
+class UserSettings(NamedTuple):
+    is_vertical: int
+    duration_sec: int
+    size: str
+
+
+DEFAULT_SETTINGS = UserSettings(1, 10, 'large')
+
+
+def _migrate(cur: sqlite3.Cursor) -> None:
+    cur.execute("BEGIN")
     try:
-        cur = conn.cursor()
         cur.execute(
             """
             CREATE TABLE IF NOT EXISTS users (
@@ -23,77 +37,116 @@ def init_db() -> None:
         cur.execute("PRAGMA table_info(users)")
         cols = {row[1] for row in cur.fetchall()}
         if "size" not in cols:
-            try:
-                cur.execute("ALTER TABLE users ADD COLUMN size TEXT NOT NULL DEFAULT 'large'")
-            except Exception:
-                pass
+            cur.execute("ALTER TABLE users ADD COLUMN size TEXT NOT NULL DEFAULT 'large'")
+
+        cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        cur.execute("COMMIT")
+    except Exception:
+        cur.execute("ROLLBACK")
+        raise
 
-        conn.commit()
+
+def init_db() -> None:
+    conn = sqlite3.connect(DB_PATH, isolation_level=None)
+    try:
+        cur = conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA user_version")
+        if cur.fetchone()[0] < SCHEMA_VERSION:
+            _migrate(cur)
     finally:
         conn.close()
 
 
-def _connect_rw() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH, timeout=10.0, isolation_level=None)
+def _apply_pragmas(conn: sqlite3.Connection, *, rw: bool) -> None:
     try:
-        conn.execute("PRAGMA journal_mode=WAL")
-        conn.execute("PRAGMA synchronous=NORMAL")
+        if rw:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA journal_size_limit=67108864")
+        else:
+            conn.execute("PRAGMA query_only=1")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA cache_size=-65536")
     except Exception:
         pass
+
+
+def _connect_rw() -> sqlite3.Connection:
+    conn = getattr(_tls, "conn", None)
+    if conn is not None:
+        return conn
+    conn = sqlite3.connect(DB_PATH, timeout=10.0, isolation_level=None)
+    _apply_pragmas(conn, rw=True)
+    _tls.conn = conn
+    return conn
+
+
+def _connect_ro() -> sqlite3.Connection:
+    conn = getattr(_tls, "conn_ro", None)
+    if conn is not None:
+        return conn
+    conn = sqlite3.connect(
+        Path(DB_PATH).resolve().as_uri() + "?mode=ro",
+        uri=True,
+        timeout=10.0,
+        isolation_level=None,
+    )
+    _apply_pragmas(conn, rw=False)
+    _tls.conn_ro = conn
     return conn
 
+
+def is_known_user(user_id: int) -> bool:
+    return user_id in _KNOWN_USERS
+
+
 def _ensure_user(conn: sqlite3.Connection, user_id: int) -> None:
+    if user_id in _KNOWN_USERS:
+        return
     conn.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (user_id,))
+    _KNOWN_USERS.add(user_id)
 
 def add_user_if_not_exists(user_id: int) -> None:
+    if user_id in _KNOWN_USERS:
+        return
     conn = _connect_rw()
-    try:
-        _ensure_user(conn, user_id)
-    finally:
-        conn.close()
+    _ensure_user(conn, user_id)
 
 
-def get_user_settings(user_id: int) -> Tuple[int, int, int, str]:
-    conn = _connect_rw()
-    try:
-        _ensure_user(conn, user_id)
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT is_vertical, duration_sec, size FROM users WHERE user_id = ?",
-            (user_id,),
-        )
-        row = cur.fetchone()
-        if row is None:
-            return 1, 10, 'small'
-        return int(row[0]), int(row[1]), str(row[2])
-    finally:
-        conn.close()
+def get_user_settings(user_id: int) -> UserSettings:
+    row = _connect_ro().execute(
+        "SELECT is_vertical, duration_sec, size FROM users WHERE user_id = ?",
+        (user_id,),
+    ).fetchone()
+    if row is None:
+        return DEFAULT_SETTINGS
+    _KNOWN_USERS.add(user_id)
+    return UserSettings._make(row)
 
 
 def update_orientation(user_id: int, is_vertical: int) -> None:
     conn = _connect_rw()
-    try:
-        _ensure_user(conn, user_id)
-        conn.execute(
-            "UPDATE users SET is_vertical = ? WHERE user_id = ?",
-            (1 if is_vertical else 0, user_id),
-        )
-    finally:
-        conn.close()
+    conn.execute(
+        "INSERT INTO users (user_id, is_vertical) VALUES (?, ?) "
+        "ON CONFLICT(user_id) DO UPDATE SET is_vertical = excluded.is_vertical "
+        "WHERE is_vertical IS NOT excluded.is_vertical",
+        (user_id, 1 if is_vertical else 0),
+    )
+    _KNOWN_USERS.add(user_id)
 
 
 def update_duration(user_id: int, duration_sec: int) -> None:
     if duration_sec not in (5, 10, 15):
         raise ValueError("duration_sec must be 5, 10, or 15")
     conn = _connect_rw()
-    try:
-        _ensure_user(conn, user_id)
-        conn.execute(
-            "UPDATE users SET duration_sec = ? WHERE user_id = ?",
-            (duration_sec, user_id),
-        )
-    finally:
-        conn.close()
+    conn.execute(
+        "INSERT INTO users (user_id, duration_sec) VALUES (?, ?) "
+        "ON CONFLICT(user_id) DO UPDATE SET duration_sec = excluded.duration_sec "
+        "WHERE duration_sec IS NOT excluded.duration_sec",
+        (user_id, duration_sec),
+    )
+    _KNOWN_USERS.add(user_id)
 
 
 def update_size(user_id: int, size: str) -> None:
@@ -101,12 +154,11 @@ def update_size(user_id: int, size: str) -> None:
     if size_norm not in ("small", "large"):
         raise ValueError("size must be 'small' or 'large'")
     conn = _connect_rw()
-    try:
-        _ensure_user(conn, user_id)
-        conn.execute(
-            "UPDATE users SET size = ? WHERE user_id = ?",
-            (size_norm, user_id),
-        )
-    finally:
-        conn.close()
+    conn.execute(
+        "INSERT INTO users (user_id, size) VALUES (?, ?) "
+        "ON CONFLICT(user_id) DO UPDATE SET size = excluded.size "
+        "WHERE size IS NOT excluded.size",
+        (user_id, size_norm),
+    )
+    _KNOWN_USERS.add(user_id)
 
@@ -0,0 +1,34 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import db
+from utils.db import UserSettings
+
+
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+
+
+async def _write(fn, *args) -> None:
+    await asyncio.get_running_loop().run_in_executor(_writer, fn, *args)
+
+
+async def get_user_settings(user_id: int) -> UserSettings:
+    return await asyncio.to_thread(db.get_user_settings, user_id)
+
+
+async def add_user_if_not_exists(user_id: int) -> None:
+    if db.is_known_user(user_id):
+        return
+    await _write(db.add_user_if_not_exists, user_id)
+
+
+async def update_orientation(user_id: int, is_vertical: int) -> None:
+    await _write(db.update_orientation, user_id, is_vertical)
+
+
+async def update_duration(user_id: int, duration_sec: int) -> None:
+    await _write(db.update_duration, user_id, duration_sec)
+
+
+async def update_size(user_id: int, size: str) -> None:
+    await _write(db.update_size, user_id, size)
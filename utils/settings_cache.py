@@ -0,0 +1,91 @@
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from utils import db_async
+from utils.db import UserSettings
+
+
+SETTINGS_TTL_SEC = 300.0
+SETTINGS_CACHE_MAX = 10000
+
+_cache: "OrderedDict[int, Tuple[float, UserSettings]]" = OrderedDict()
+_versions: Dict[int, int] = {}
+_pending: Dict[int, int] = {}
+
+
+def _store(user_id: int, settings: UserSettings) -> None:
+    _cache[user_id] = (time.monotonic(), settings)
+    _cache.move_to_end(user_id)
+    while len(_cache) > SETTINGS_CACHE_MAX:
+        _cache.popitem(last=False)
+
+
+def _bump(user_id: int) -> None:
+    _versions[user_id] = _versions.get(user_id, 0) + 1
+
+
+def _enter(user_id: int) -> None:
+    _pending[user_id] = _pending.get(user_id, 0) + 1
+
+
+def _leave(user_id: int) -> None:
+    # Versions only matter while a load or write is in flight.
+    remaining = _pending[user_id] - 1
+    if remaining:
+        _pending[user_id] = remaining
+    else:
+        del _pending[user_id]
+        _versions.pop(user_id, None)
+
+
+def invalidate(user_id: int) -> None:
+    _cache.pop(user_id, None)
+
+
+async def get_cached(user_id: int) -> UserSettings:
+    entry = _cache.get(user_id)
+    if entry is not None and time.monotonic() - entry[0] < SETTINGS_TTL_SEC:
+        _cache.move_to_end(user_id)
+        return entry[1]
+    _enter(user_id)
+    try:
+        version = _versions.get(user_id, 0)
+        settings = await db_async.get_user_settings(user_id)
+        overlapped = _versions.get(user_id, 0) != version
+    finally:
+        _leave(user_id)
+    if overlapped:
+        # A write overlapped this read, so the row may predate it.
+        entry = _cache.get(user_id)
+        return entry[1] if entry is not None else settings
+    _store(user_id, settings)
+    return settings
+
+
+async def _update(user_id: int, fn: Callable[[int, Any], Awaitable[None]], value: Any, **changes: Any) -> None:
+    _enter(user_id)
+    _bump(user_id)
+    entry = _cache.get(user_id)
+    if entry is not None:
+        _store(user_id, entry[1]._replace(**changes))
+    try:
+        await fn(user_id, value)
+    except Exception:
+        invalidate(user_id)
+        raise
+    finally:
+        _bump(user_id)
+        _leave(user_id)
+
+
+async def update_orientation(user_id: int, is_vertical: int) -> None:
+    await _update(user_id, db_async.update_orientation, is_vertical, is_vertical=1 if is_vertical else 0)
+
+
+async def update_duration(user_id: int, duration_sec: int) -> None:
+    await _update(user_id, db_async.update_duration, duration_sec, duration_sec=duration_sec)
+
+
+async def update_size(user_id: int, size: str) -> None:
+    await _update(user_id, db_async.update_size, size, size=(size or '').lower())
@@ -4,20 +4,31 @@ import asyncio
 import base64
 import json
 import mimetypes
+import os
+import random
 import re
 import time
 import uuid as _uuid
-from aiohttp_socks import ProxyConnector  
+from collections import defaultdict
+from functools import lru_cache
 from aiohttp_socks import ProxyConnector
 from pathlib import Path
-from typing import Any, AsyncGenerator, Dict, Iterable, List, Mapping, Optional, Union
+from typing import Any, AsyncGenerator, Callable, Dict, Iterable, List, Mapping, Optional, Tuple, Union
 
 import aiohttp
+import orjson
 from yarl import URL
-from playwright.async_api import async_playwright
+from playwright.async_api import Browser, Playwright, async_playwright
 
 SORA_BASE = "https://sora.chatgpt.com"
 DEBUG = False
+POLL_MIN_INTERVAL_SEC = 0.5
+POLL_MAX_INTERVAL_SEC = 15.0
+POLL_NEAR_DONE_PCT = 0.9
+POLL_NEAR_DONE_MAX_POLLS = 6
+
+_COOKIE_NAME_RE = re.compile(r"[!#$%&'*+.^_`|~0-9A-Za-z-]+")
+_INVALID_IMAGE_RE = re.compile(r"face|person|people|invalid image", re.IGNORECASE)
 
 
 def _dbg(msg: str, *args: Any) -> None:
@@ -80,6 +91,32 @@ DEFAULT_HEADERS = {
     "origin": SORA_BASE,
 }
 
+_CONNECTOR_KWARGS: Dict[str, Any] = {
+    "limit": 64,
+    "limit_per_host": 32,
+    "ttl_dns_cache": 300,
+    "keepalive_timeout": 75,
+}
+
+_JSON_HEADERS: Mapping[str, str] = {"content-type": "application/json"}
+_EMPTY_KWARGS: Mapping[str, Any] = {}
+
+RETRY_MAX_ATTEMPTS = 2
+RETRY_BASE_DELAY_SEC = 0.5
+RETRY_MAX_DELAY_SEC = 10.0
+_RETRY_ANY_STATUSES = frozenset({429})
+_RETRY_IDEMPOTENT_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def _retry_after_sec(resp: aiohttp.ClientResponse) -> Optional[float]:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
 
 class SoraClient:
 
@@ -93,33 +130,44 @@ class SoraClient:
         _dbg("SoraClient.__init__: base_url=%s, proxy=%s", base_url, proxy or "-")
         self._base = base_url.rstrip("/")
         self._proxy = proxy
-        self._cookies_map = self._normalize_cookies(cookies)
-        _dbg(
-            "SoraClient.__init__: cookies_map_keys=%s",
-            list(self._cookies_map.keys())
+        self._socks_url: Optional[str] = None
+        if proxy and proxy.lower().startswith("socks"):
+            if proxy.lower().startswith("socks://"):
+                self._socks_url = "socks5://" + proxy.split("://", 1)[1]
+            else:
+                self._socks_url = proxy
+        self._request_kwargs: Mapping[str, Any] = (
+            {"proxy": proxy} if proxy and not self._socks_url else _EMPTY_KWARGS
         )
+        cookies_obj = json.loads(cookies) if isinstance(cookies, str) else cookies
+        self._cookies_map = self._normalize_cookies(cookies_obj)
+        if DEBUG:
+            _dbg(
+                "SoraClient.__init__: cookies_map_keys=%s",
+                list(self._cookies_map.keys())
+            )
 
         self._session: Optional[aiohttp.ClientSession] = None
         self._access_token: Optional[str] = None
         self._token_exp_ts: Optional[float] = None
+        self._token_valid_until: Optional[float] = None
         self._refresh_lock: Optional[asyncio.Lock] = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
         self._sentinel_token: Optional[str] = None
-        self._cookies_seed_json: Optional[str] = None
-        try:
-            if isinstance(cookies, str):
-                json.loads(cookies)
-                self._cookies_seed_json = cookies
-            else:
-                self._cookies_seed_json = json.dumps(cookies)
-        except Exception:
-            try:
-                self._cookies_seed_json = json.dumps(self._reconstruct_cookies_list())
-            except Exception:
-                self._cookies_seed_json = None
-        _dbg(
-            "SoraClient.__init__: cookies_seed_json=%s",
-            _shorten(self._cookies_seed_json)
+        self._sentinel_exp: Optional[float] = None
+        self._sentinel_key: Optional[Tuple[str, str]] = None
+        self._sentinel_task: Optional[asyncio.Task] = None
+        self._sentinel_header: Optional[Tuple[str, str, Dict[str, str]]] = None
+        self._device_id: Optional[str] = None
+        for _cookies in self._cookies_map.values():
+            if _cookies.get("oai-did"):
+                self._device_id = str(_cookies["oai-did"])
+                break
+        self._cookies_seed_obj: Optional[Union[List[Any], Mapping[str, Any]]] = (
+            cookies_obj if isinstance(cookies_obj, (list, Mapping)) else None
         )
+        if DEBUG:
+            _dbg("SoraClient.__init__: cookies_seed=%s", _shorten(self._cookies_seed_obj))
     @staticmethod
     def _normalize_cookies(
         cookies: Union[str, Mapping[str, str], Iterable[Mapping[str, Any]]]
@@ -132,8 +180,7 @@ class SoraClient:
 
         jar_like: Dict[str, Dict[str, str]] = {}
 
-        def _valid_cookie_name(n: str) -> bool:
-            return bool(re.match(r"^[!#$%&'*+.^_`|~0-9A-Za-z-]+$", n))
+        _valid_cookie_name = _COOKIE_NAME_RE.fullmatch
         if isinstance(cookies_obj, Iterable) and not isinstance(cookies_obj, Mapping):
             cnt = 0
             for c in cookies_obj: 
@@ -148,7 +195,8 @@ class SoraClient:
                 key = f"{str(domain).lstrip('.') }|{path}"
                 jar_like.setdefault(key, {})[str(name)] = str(value)
                 cnt += 1
-            _dbg("_normalize_cookies: list processed=%d keys=%s", cnt, list(jar_like.keys()))
+            if DEBUG:
+                _dbg("_normalize_cookies: list processed=%d keys=%s", cnt, list(jar_like.keys()))
             return jar_like
         if isinstance(cookies_obj, Mapping):
             key = "sora.chatgpt.com|/"
@@ -167,21 +215,18 @@ class SoraClient:
             return self._session
 
         jar = aiohttp.CookieJar(unsafe=True)
-        headers = dict(DEFAULT_HEADERS)
 
         connector = None
-        if self._proxy and self._proxy.lower().startswith("socks"):
+        if self._socks_url:
             try:
-                proxy_url = self._proxy
-                if proxy_url.lower().startswith("socks://"):
-                    proxy_url = "socks5://" + proxy_url.split("://", 1)[1]
-
-                connector = ProxyConnector.from_url(proxy_url)
+                connector = ProxyConnector.from_url(self._socks_url, **_CONNECTOR_KWARGS)
                 _dbg("using socks proxy connector")
             except Exception as e:
                 _dbg("failed to init socks proxy: %r", e)
+        if connector is None:
+            connector = aiohttp.TCPConnector(**_CONNECTOR_KWARGS)
 
-        self._session = aiohttp.ClientSession(cookie_jar=jar, headers=headers, connector=connector)
+        self._session = aiohttp.ClientSession(cookie_jar=jar, headers=DEFAULT_HEADERS, connector=connector)
         _dbg("_ensure_session: created session; proxy=%s", self._proxy or "-")
         seeded = 0
         for key, cookies in self._cookies_map.items():
@@ -192,26 +237,37 @@ class SoraClient:
                 targets.add("sora.chatgpt.com")
             for host in targets:
                 resp_url = URL.build(scheme="https", host=host, path=path or "/")
-                for name, value in cookies.items():
-                    jar.update_cookies({name: value}, response_url=resp_url)
-                    seeded += 1
+                jar.update_cookies(cookies, response_url=resp_url)
+                seeded += len(cookies)
         _dbg("_ensure_session: cookies seeded=%d", seeded)
 
         return self._session
 
+    def _set_token_exp(self, exp: Optional[float]) -> None:
+        self._token_exp_ts = exp
+        if exp:
+            self._token_valid_until = time.monotonic() + (exp - 60 - time.time())
+        else:
+            self._token_valid_until = None
+
     async def _ensure_access_token(self) -> str:
+        valid_until = self._token_valid_until
+        if valid_until is not None and time.monotonic() < valid_until and self._access_token:
+            return self._access_token
+
         if self._access_token and self._token_exp_ts:
-            _dbg(
-                "_ensure_access_token: have token exp=%s",
-                time.strftime("%H:%M:%S", time.localtime(self._token_exp_ts)) if self._token_exp_ts else "-",
-            )
+            if DEBUG:
+                _dbg(
+                    "_ensure_access_token: have token exp=%s",
+                    time.strftime("%H:%M:%S", time.localtime(self._token_exp_ts)),
+                )
             now = time.time()
             if now < (self._token_exp_ts - 60):
                 _dbg("_ensure_access_token: token still valid")
                 return self._access_token
         elif self._access_token and not self._token_exp_ts:
             try:
-                self._token_exp_ts = _decode_jwt_exp(self._access_token)
+                self._set_token_exp(_decode_jwt_exp(self._access_token))
                 now = time.time()
                 if self._token_exp_ts and now < (self._token_exp_ts - 60):
                     _dbg("_ensure_access_token: decoded exp, token valid")
@@ -222,7 +278,8 @@ class SoraClient:
         _dbg("_ensure_access_token: refreshing access token")
         await self._refresh_access_token(force=True)
         assert self._access_token, "missing access token after refresh"
-        _dbg("_ensure_access_token: got token=%s", _redact(self._access_token))
+        if DEBUG:
+            _dbg("_ensure_access_token: got token=%s", _redact(self._access_token))
         return self._access_token
 
     async def _refresh_access_token(self, *, force: bool = False) -> None:
@@ -237,134 +294,143 @@ class SoraClient:
                 if now < (self._token_exp_ts - 60):
                     _dbg("_refresh_access_token: skip, still valid")
                     return
+            task = self._refresh_task
+            if task is None or task.done():
+                task = asyncio.create_task(self._do_refresh_access_token(sess))
+                self._refresh_task = task
+            else:
+                _dbg("_refresh_access_token: joining in-flight refresh")
+        await asyncio.shield(task)
 
-            url = f"{self._base}/api/auth/session"
-            kwargs: Dict[str, Any] = {}
-            if self._proxy and not self._proxy.lower().startswith("socks"):
-                kwargs["proxy"] = self._proxy
+    async def _do_refresh_access_token(self, sess: aiohttp.ClientSession) -> None:
+        url = f"{self._base}/api/auth/session"
+        kwargs = self._request_kwargs
 
-            _dbg("GET %s", url)
-            async with sess.get(url, **kwargs) as r:
-                _dbg("auth session status=%d", r.status)
-                if r.status != 200:
-                    try:
-                        body = await r.json()
-                    except Exception:
-                        body = await r.text()
-                    raise RuntimeError(f"auth_session_failed: status={r.status}, response={str(body)[:200]}")
+        _dbg("GET %s", url)
+        async with sess.get(url, **kwargs) as r:
+            _dbg("auth session status=%d", r.status)
+            if r.status != 200:
                 try:
-                    data = await r.json()
+                    body = await r.json()
                 except Exception:
                     body = await r.text()
-                    raise RuntimeError(f"auth_session_invalid_json: status={r.status}, response={str(body)[:200]}")
+                raise RuntimeError(f"auth_session_failed: status={r.status}, response={str(body)[:200]}")
+            try:
+                data = await r.json()
+            except Exception:
+                body = await r.text()
+                raise RuntimeError(f"auth_session_invalid_json: status={r.status}, response={str(body)[:200]}")
 
-            if not isinstance(data, Mapping):
-                raise RuntimeError(f"auth_session_unexpected_payload: {str(data)[:200]}")
+        if not isinstance(data, Mapping):
+            raise RuntimeError(f"auth_session_unexpected_payload: {str(data)[:200]}")
 
-            token = data.get("accessToken")
-            if not token:
-                raise RuntimeError("auth_session_missing_access_token")
+        token = data.get("accessToken")
+        if not token:
+            raise RuntimeError("auth_session_missing_access_token")
 
-            self._access_token = str(token)
-            self._token_exp_ts = _decode_jwt_exp(self._access_token)
-            sess.headers["authorization"] = f"Bearer {self._access_token}"
+        self._access_token = str(token)
+        self._set_token_exp(_decode_jwt_exp(self._access_token))
+        sess.headers["authorization"] = f"Bearer {self._access_token}"
+        if DEBUG:
             _dbg(
                 "_refresh_access_token: new token=%s exp=%s",
                 _redact(self._access_token),
                 self._token_exp_ts,
             )
-            try:
-                device_id = None
-                for _k, _cookies in self._cookies_map.items():
-                    if "oai-did" in _cookies:
-                        device_id = _cookies.get("oai-did")
-                        break
-                if device_id:
-                    sess.headers.setdefault("OAI-Device-Id", str(device_id))
-                    _dbg("_refresh_access_token: set OAI-Device-Id from cookies=%s", _redact(device_id))
-            except Exception:
-                pass
-    async def _get(self, path: str) -> aiohttp.ClientResponse:
+        if self._device_id:
+            sess.headers.setdefault("OAI-Device-Id", self._device_id)
+            if DEBUG:
+                _dbg("_refresh_access_token: set OAI-Device-Id=%s", _redact(self._device_id))
+
+    async def _request_with_refresh(
+        self,
+        method: str,
+        url: str,
+        *,
+        retry_on_401: bool = True,
+        quiet: bool = False,
+        data_factory: Optional[Callable[[], Any]] = None,
+        **kwargs: Any,
+    ) -> aiohttp.ClientResponse:
         sess = await self._ensure_session()
         await self._ensure_access_token()
+        retry_statuses = _RETRY_IDEMPOTENT_STATUSES if method == "GET" else _RETRY_ANY_STATUSES
+        refreshed = not retry_on_401
+        attempt = 0
+        while True:
+            if data_factory is not None:
+                kwargs["data"] = data_factory()
+            resp = await sess.request(method, url, **self._request_kwargs, **kwargs)
+            if not quiet:
+                _dbg("%s %s: status=%d", method, url, resp.status)
+            if resp.status == 401 and not refreshed:
+                _dbg("%s %s: 401 -> refresh token and retry", method, url)
+                refreshed = True
+                resp.release()
+                await self._refresh_access_token(force=True)
+                continue
+            if resp.status in retry_statuses and attempt < RETRY_MAX_ATTEMPTS:
+                delay = _retry_after_sec(resp)
+                if delay is None:
+                    delay = RETRY_BASE_DELAY_SEC * 2 ** attempt
+                delay = min(delay, RETRY_MAX_DELAY_SEC)
+                attempt += 1
+                _dbg("%s %s: status=%d -> retry %d in %.1fs", method, url, resp.status, attempt, delay)
+                resp.release()
+                await asyncio.sleep(delay)
+                continue
+            return resp
+
+    async def _get(self, path: str) -> aiohttp.ClientResponse:
         url = path if path.startswith("http") else f"{self._base}{path}"
         _is_noise = "/backend/project_y/profile/drafts" in url
         if not _is_noise:
             _dbg("_get: url=%s", url)
-        kwargs: Dict[str, Any] = {}
-        if self._proxy and not self._proxy.lower().startswith("socks"):
-            kwargs["proxy"] = self._proxy
-        resp = await sess.get(url, **kwargs)
-        if not _is_noise:
-            _dbg("_get: status=%d", resp.status)
-        if resp.status == 401:
-            _dbg("_get: 401 -> refresh token and retry")
-            await self._refresh_access_token(force=True)
-            resp.release()
-            resp = await sess.get(url, **kwargs)
-            if not _is_noise:
-                _dbg("_get: retry status=%d", resp.status)
-        return resp
+        return await self._request_with_refresh("GET", url, quiet=_is_noise)
 
     async def _post_json(self, path: str, payload: Mapping[str, Any], extra_headers: Optional[Mapping[str, str]] = None) -> aiohttp.ClientResponse:
-        sess = await self._ensure_session()
-        await self._ensure_access_token()
         url = path if path.startswith("http") else f"{self._base}{path}"
-        _dbg("_post_json: url=%s payload=%s headers=%s", url, _shorten(payload), list((extra_headers or {}).keys()))
-        kwargs: Dict[str, Any] = {}
-        if self._proxy and not self._proxy.lower().startswith("socks"):
-            kwargs["proxy"] = self._proxy
-        headers = {"content-type": "application/json"}
-        if isinstance(extra_headers, Mapping):
-            headers.update({k: str(v) for k, v in extra_headers.items()})
-        resp = await sess.post(url, json=dict(payload), headers=headers, **kwargs)
-        _dbg("_post_json: status=%d", resp.status)
-        if resp.status == 401:
-            _dbg("_post_json: 401 -> refresh token and retry")
-            await self._refresh_access_token(force=True)
-            resp.release()
-            resp = await sess.post(url, json=dict(payload), headers=headers, **kwargs)
-            _dbg("_post_json: retry status=%d", resp.status)
-        return resp
+        if DEBUG:
+            _dbg("_post_json: url=%s payload=%s headers=%s", url, _shorten(payload), list((extra_headers or {}).keys()))
+        headers = _JSON_HEADERS
+        if extra_headers:
+            headers = {**_JSON_HEADERS, **{k: str(v) for k, v in extra_headers.items()}}
+        return await self._request_with_refresh("POST", url, json=dict(payload), headers=headers)
 
     async def _post_multipart(
         self,
         path: str,
         file_field: str,
         filename: str,
-        data_bytes: bytes,
+        data_bytes: Union[bytes, bytearray, memoryview],
         content_type: str,
     ) -> aiohttp.ClientResponse:
-        sess = await self._ensure_session()
-        await self._ensure_access_token()
         url = path if path.startswith("http") else f"{self._base}{path}"
         _dbg("_post_multipart: url=%s filename=%s ctype=%s size=%d", url, filename, content_type, len(data_bytes))
-        form = aiohttp.FormData()
-        form.add_field(file_field, data_bytes, filename=filename, content_type=content_type)
-        form.add_field("file_name", filename)
-        kwargs: Dict[str, Any] = {}
-        if self._proxy and not self._proxy.lower().startswith("socks"):
-            kwargs["proxy"] = self._proxy
-        resp = await sess.post(url, data=form, **kwargs)
-        _dbg("_post_multipart: status=%d", resp.status)
-        if resp.status == 401:
-            _dbg("_post_multipart: 401 -> refresh token and retry")
-            await self._refresh_access_token(force=True)
-            resp.release()
-            resp = await sess.post(url, data=form, **kwargs)
-            _dbg("_post_multipart: retry status=%d", resp.status)
-        return resp
+
+        def _build_form() -> aiohttp.FormData:
+            form = aiohttp.FormData()
+            form.add_field(file_field, data_bytes, filename=filename, content_type=content_type)
+            form.add_field("file_name", filename)
+            return form
+
+        return await self._request_with_refresh("POST", url, data_factory=_build_form)
     async def validate_cookies(self) -> str:
         await self._ensure_access_token()
         assert self._access_token
         return self._access_token
     async def aclose(self) -> None:
+        for task in (self._refresh_task, self._sentinel_task):
+            if task is not None and not task.done():
+                task.cancel()
         try:
             if self._session and not self._session.closed:
                 _dbg("aclose: closing session")
                 await self._session.close()
         except Exception:
             pass
+        await _PW_STATE.aclose()
+        _decode_jwt_exp.cache_clear()
 
     async def __aenter__(self) -> "SoraClient":
         _dbg("__aenter__: ensure session")
@@ -391,17 +457,23 @@ class SoraClient:
         if not token_str:
             _dbg("_build_sentinel_header: no sentinel token yet for flow=%s", flow)
             return None
+        cached = self._sentinel_header
+        if cached is not None and cached[0] == token_str and cached[1] == flow:
+            return cached[2]
+        raw_token = token_str
         try:
-            obj = json.loads(token_str)
+            obj = orjson.loads(token_str)
             if isinstance(obj, Mapping):
                 if str(obj.get("flow") or "") != flow:
                     obj = dict(obj)
                     obj["flow"] = flow
-                token_str = json.dumps(obj, separators=(",", ":"))
+                    token_str = orjson.dumps(obj).decode()
             _dbg("_build_sentinel_header: prepared for flow=%s", flow)
         except Exception:
             pass
-        return {"OpenAI-Sentinel-Token": token_str}
+        header = {"OpenAI-Sentinel-Token": token_str}
+        self._sentinel_header = (raw_token, flow, header)
+        return header
 
     def _reconstruct_cookies_list(self) -> List[Dict[str, Any]]:
         lst: List[Dict[str, Any]] = []
@@ -419,33 +491,36 @@ class SoraClient:
         _dbg("_reconstruct_cookies_list: total=%d", len(lst))
         return lst
 
+    def _sentinel_fresh(self) -> bool:
+        if not self._sentinel_token:
+            return False
+        return _sentinel_usable(self._sentinel_exp)
+
+    def _drop_sentinel_token(self) -> None:
+        if self._sentinel_key is not None:
+            _drop_cached_sentinel(*self._sentinel_key)
+        self._sentinel_token = None
+        self._sentinel_exp = None
+        self._sentinel_key = None
+        self._sentinel_header = None
+
     async def _ensure_sentinel_token(self, flow: str) -> None:
-        if self._sentinel_token:
+        if self._sentinel_fresh():
             _dbg("_ensure_sentinel_token: already present for flow=%s", flow)
             return
-        try:
-            cookies_obj: Union[str, List[Dict[str, Any]], Dict[str, Any]]
-            if self._cookies_seed_json:
-                cookies_obj = json.loads(self._cookies_seed_json)
-            else:
-                cookies_obj = self._reconstruct_cookies_list()
-        except Exception:
-            cookies_obj = self._reconstruct_cookies_list()
+        cookies_obj = self._cookies_seed_obj
+        if not cookies_obj:
+            cookies_obj = self._cookies_seed_obj = self._reconstruct_cookies_list()
 
         sess = await self._ensure_session()
         ua = sess.headers.get("user-agent")
-        device_id = sess.headers.get("OAI-Device-Id")
-        if not device_id:
-            for _k, _cookies in self._cookies_map.items():
-                if "oai-did" in _cookies:
-                    device_id = _cookies.get("oai-did")
-                    break
+        device_id = sess.headers.get("OAI-Device-Id") or self._device_id
         if not device_id:
-            device_id = str(_uuid.uuid4())
+            device_id = self._device_id = str(_uuid.uuid4())
             sess.headers["OAI-Device-Id"] = device_id
 
         try:
-            token_str = await get_sentinel_token_via_playwright(
+            token_str, exp = await get_sentinel_token_via_playwright(
                 cookies=cookies_obj,
                 device_id=str(device_id),
                 user_agent=ua,
@@ -453,11 +528,23 @@ class SoraClient:
                 proxy=self._proxy,
             )
             self._sentinel_token = token_str
-            _dbg("_ensure_sentinel_token: fetched token=%s", _redact(token_str))
+            self._sentinel_exp = exp
+            self._sentinel_key = (flow, str(device_id))
+            if DEBUG:
+                _dbg("_ensure_sentinel_token: fetched token=%s", _redact(token_str))
         except Exception as e:
             _dbg("sentinel auto fetch failed: %r", e)
             return
 
+    def _prefetch_sentinel_token(self, flow: str) -> Optional[asyncio.Task]:
+        if self._sentinel_fresh():
+            return None
+        task = self._sentinel_task
+        if task is None or task.done():
+            task = asyncio.create_task(self._ensure_sentinel_token(flow))
+            self._sentinel_task = task
+        return task
+
     async def generate_video(
         self,
         *,
@@ -465,18 +552,19 @@ class SoraClient:
         frames: int,
         orientation: Optional[str] = None, 
         size: Optional[str] = None,
-        start_image: Optional[Union[str, Path, bytes]] = None, 
+        start_image: Optional[Union[str, Path, bytes, memoryview]] = None, 
         poll_interval_sec: float = 3.0,
         timeout_sec: float = 600.0,
         sentinel_flow: str = "sora_2_create_task",
     ) -> AsyncGenerator[Dict[str, Any], None]:
 
-        _dbg(
-            "generate_video: prompt=%s frames=%s orientation=%s size=%s start_image=%s flow=%s",
-            _shorten(prompt), frames, orientation, size,
-            (str(start_image) if isinstance(start_image, (str, Path)) else ("bytes" if isinstance(start_image, (bytes, bytearray)) else None)),
-            sentinel_flow,
-        )
+        if DEBUG:
+            _dbg(
+                "generate_video: prompt=%s frames=%s orientation=%s size=%s start_image=%s flow=%s",
+                _shorten(prompt), frames, orientation, size,
+                (str(start_image) if isinstance(start_image, (str, Path)) else ("bytes" if isinstance(start_image, (bytes, bytearray, memoryview)) else None)),
+                sentinel_flow,
+            )
         if not prompt or not isinstance(prompt, str):
             raise ValueError("prompt is required and must be a string")
         if not isinstance(frames, int) or frames <= 0:
@@ -493,6 +581,7 @@ class SoraClient:
             _dbg("generate_video: auth_failed: %r", e)
             yield {"event": "error", "code": "auth_failed", "message": str(e)}
             return
+        sentinel_task = self._prefetch_sentinel_token(sentinel_flow)
         _dbg("generate_video: maybe authenticate")
         await self._maybe_authenticate()
         upload_id: Optional[str] = None
@@ -501,11 +590,11 @@ class SoraClient:
             try:
                 if isinstance(start_image, (str, Path)):
                     path = Path(start_image)
-                    data_bytes = path.read_bytes()
+                    data_bytes = await asyncio.to_thread(path.read_bytes)
                     filename = path.name
                     content_type = _detect_mime(filename)
-                elif isinstance(start_image, (bytes, bytearray)):
-                    data_bytes = bytes(start_image)
+                elif isinstance(start_image, (bytes, bytearray, memoryview)):
+                    data_bytes = start_image
                     filename = "photo.jpg"
                     content_type = "image/jpeg"
                 else:
@@ -523,7 +612,7 @@ class SoraClient:
                     err = await _parse_error_resp(r)
                     code = err.get("code") or "upload_failed"
                     msg = err.get("message")
-                    if r.status == 400 and any(k in (str(msg or "").lower()) for k in ("face", "person", "people", "invalid image")):
+                    if r.status == 400 and _INVALID_IMAGE_RE.search(str(msg or "")):
                         code = "invalid_start_image"
                     yield {"event": "error", "code": code, "message": msg, "details": err}
                     return
@@ -558,15 +647,19 @@ class SoraClient:
             payload["inpaint_items"] = [{"kind": "upload", "upload_id": upload_id}]
         else:
             payload["orientation"] = orientation or "portrait"
+        if sentinel_task is not None:
+            await asyncio.shield(sentinel_task)
         sentinel_hdr = self._build_sentinel_header(sentinel_flow)
-        if not sentinel_hdr:
+        if not sentinel_hdr and sentinel_task is None:
             await self._ensure_sentinel_token(sentinel_flow)
             sentinel_hdr = self._build_sentinel_header(sentinel_flow)
-        _dbg("generate_video: create payload=%s", _shorten(payload))
+        if DEBUG:
+            _dbg("generate_video: create payload=%s", _shorten(payload))
         r = await self._post_json("/backend/nf/create", payload, extra_headers=sentinel_hdr)
         if r.status != 200:
             err = await _parse_error_resp(r)
             if (err.get("code") or "").lower() == "sentinel_block":
+                self._drop_sentinel_token()
                 msg = (
                     "Запрос отклонён защитой Sentinel. Модуль не смог автоматически получить "
                     "корректный OpenAI-Sentinel-Token. Убедитесь, что cookies валидны и вы авторизованы, "
@@ -588,27 +681,38 @@ class SoraClient:
         yield {"event": "queued", "task_id": task_id, "priority": ci.get("priority")}
         start_time = time.time()
         found_gen_id: Optional[str] = None
-        last_progress_fingerprint: Optional[str] = None
+        last_progress_fingerprint: Optional[tuple] = None
+        misses = 0
+        was_rendering = False
+        near_done_polls = 0
 
         while True:
             if time.time() - start_time > timeout_sec:
                 yield {"event": "error", "code": "timeout", "message": "Generation timed out"}
                 return
             pending_item: Optional[Dict[str, Any]] = None
-            try:
-                pr = await self._get("/backend/nf/pending")
-                if pr.status == 200:
-                    try:
-                        arr = await pr.json()
-                        if isinstance(arr, list):
-                            for it in arr:
-                                if it.get("id") == task_id:
-                                    pending_item = it
-                                    break
-                    except Exception:
-                        pass
-            except Exception as e:
-                _dbg("pending request failed: %r", e)
+            near_done = False
+            pr, r = await asyncio.gather(
+                self._get("/backend/nf/pending"),
+                self._get("/backend/project_y/profile/drafts?limit=15"),
+                return_exceptions=True,
+            )
+            if isinstance(pr, BaseException):
+                _dbg("pending request failed: %r", pr)
+            elif pr.status == 200:
+                try:
+                    arr = await pr.json(loads=orjson.loads)
+                    if isinstance(arr, list):
+                        for it in arr:
+                            if it.get("id") == task_id:
+                                pending_item = it
+                                break
+                except Exception:
+                    pass
+            else:
+                pr.release()
+            if isinstance(r, BaseException):
+                raise r
 
             if pending_item:
                 status = (pending_item.get("status") or "").lower()
@@ -617,9 +721,13 @@ class SoraClient:
                 eta = pending_item.get("estimated_queue_wait_time")
                 msg = pending_item.get("queue_status_message")
                 _dbg("generate_video: pending status=%s pct=%s pos=%s eta=%s", status, pct, pos, eta)
+                near_done = status == "processing_close_to_done" or (
+                    isinstance(pct, (int, float)) and pct >= POLL_NEAR_DONE_PCT
+                )
 
                 fail_reason = pending_item.get("failure_reason")
                 if fail_reason or status in ("failed", "error", "canceled"):
+                    r.release()
                     reason = str(fail_reason or status or "processing_error")
                     yield {
                         "event": "error",
@@ -632,6 +740,7 @@ class SoraClient:
                     return
 
                 is_rendering = (status not in ("queued", "preprocessing")) or (isinstance(pct, (int, float)) and float(pct or 0) > 0.0)
+                was_rendering = was_rendering or is_rendering
                 if not is_rendering:
                     progress_event = {
                         "event": "progress",
@@ -649,14 +758,26 @@ class SoraClient:
                         "progress_pct": pct,
                         "message": msg,
                     }
-                fp = json.dumps(progress_event, sort_keys=True)
+                fp = (
+                    progress_event["status"],
+                    progress_event.get("progress_pct"),
+                    progress_event.get("queue_position"),
+                    progress_event.get("eta_sec"),
+                    progress_event.get("message"),
+                )
                 if fp != last_progress_fingerprint:
                     last_progress_fingerprint = fp
+                    misses = 0
                     yield progress_event
+                else:
+                    misses += 1
+            elif was_rendering:
+                near_done = True
+                misses += 1
             else:
+                misses += 1
                 if last_progress_fingerprint is None:
                     yield {"event": "progress", "status": "queued", "task_id": task_id}
-            r = await self._get("/backend/project_y/profile/drafts?limit=15")
             if r.status == 401:
                 yield {"event": "error", "code": "auth_expired", "message": "Authentication expired while polling"}
                 return
@@ -666,7 +787,7 @@ class SoraClient:
                 return
 
             try:
-                items = (await r.json()).get("items", [])
+                items = (await r.json(loads=orjson.loads)).get("items", [])
             except Exception:
                 items = []
 
@@ -697,7 +818,8 @@ class SoraClient:
 
                 if draft_has_error:
                     reason = str(code_val or "processing_error")
-                    _dbg("generate_video: draft_error code=%s msg=%s", reason, _shorten(msg_val))
+                    if DEBUG:
+                        _dbg("generate_video: draft_error code=%s msg=%s", reason, _shorten(msg_val))
                     yield {
                         "event": "error",
                         "code": reason,
@@ -709,10 +831,11 @@ class SoraClient:
                     return
 
                 if my.get("url") and my.get("encodings"):
-                    if found_gen_id:
+                    has_details = my.get("width") and my.get("height") and my.get("prompt")
+                    if found_gen_id and not has_details:
                         v2 = await self._get(f"/backend/project_y/profile/drafts/v2/{found_gen_id}")
                         if v2.status == 200:
-                            d = (await v2.json()).get("draft", {})
+                            d = (await v2.json(loads=orjson.loads)).get("draft", {})
                             _dbg("generate_video: finished v2 url=%s", d.get("url"))
                             yield {
                                 "event": "finished",
@@ -724,7 +847,8 @@ class SoraClient:
                                 "prompt": d.get("prompt"),
                             }
                             return
-                    _dbg("generate_video: finished fallback url=%s", my.get("url"))
+                        v2.release()
+                    _dbg("generate_video: finished url=%s", my.get("url"))
                     yield {
                         "event": "finished",
                         "gen_id": found_gen_id,
@@ -736,60 +860,74 @@ class SoraClient:
                     }
                     return
 
-            await asyncio.sleep(poll_interval_sec)
+            if near_done and near_done_polls < POLL_NEAR_DONE_MAX_POLLS:
+                near_done_polls += 1
+                delay = POLL_MIN_INTERVAL_SEC
+            else:
+                ceiling = min(poll_interval_sec * 2 ** min(misses, 8), POLL_MAX_INTERVAL_SEC)
+                delay = random.uniform(POLL_MIN_INTERVAL_SEC, max(ceiling, POLL_MIN_INTERVAL_SEC))
+            await asyncio.sleep(delay)
 
-def _parse_error_resp(resp: aiohttp.ClientResponse) -> "asyncio.Future[Dict[str, Any]]":
-    async def _inner() -> Dict[str, Any]:
-        _dbg("_parse_error_resp: status=%d", resp.status)
-        try:
-            data = await resp.json()
-            err = data.get("error") or {}
-        except Exception:
-            err = {}
-            try:
-                data = await resp.text()
-            except Exception:
-                data = ""
+async def _parse_error_resp(resp: aiohttp.ClientResponse) -> Dict[str, Any]:
+    _dbg("_parse_error_resp: status=%d", resp.status)
+    try:
+        body = await resp.read()
+    except Exception:
+        body = b""
+    try:
+        data = orjson.loads(body)
+        err = data.get("error") or {}
+    except Exception:
+        err = {}
+        data = body.decode(resp.charset or "utf-8", errors="replace")
+    if DEBUG:
         _dbg(
             "_parse_error_resp: type=%s code=%s msg=%s",
             (err or {}).get("type"), (err or {}).get("code"), _shorten((err or {}).get("message") or data)
         )
-        return {
-            "http_status": resp.status,
-            "type": (err or {}).get("type"),
-            "code": (err or {}).get("code"),
-            "message": (err or {}).get("message") or (data if isinstance(data, str) else ""),
-            "raw": data,
-        }
+    return {
+        "http_status": resp.status,
+        "type": (err or {}).get("type"),
+        "code": (err or {}).get("code"),
+        "message": (err or {}).get("message") or (data if isinstance(data, str) else ""),
+        "raw": data,
+    }
+
 
-    return asyncio.ensure_future(_inner())
+@lru_cache(maxsize=64)
+def _mime_for_ext(ext: str) -> str:
+    mime, _ = mimetypes.guess_type("x" + ext)
+    return mime or "application/octet-stream"
 
 
 def _detect_mime(path: str) -> str:
-    mime, _ = mimetypes.guess_type(path)
-    out = mime or "application/octet-stream"
+    out = _mime_for_ext(os.path.splitext(path)[1].lower())
     _dbg("_detect_mime: %s -> %s", path, out)
     return out
 
 
+def _b64fix(s: bytes) -> bytes:
+    return base64.urlsafe_b64decode(s + b"=" * (-len(s) & 3))
+
+
+@lru_cache(maxsize=256)
 def _decode_jwt_exp(token: str) -> Optional[float]:
     try:
-        parts = token.split(".")
-        if len(parts) != 3:
-            _dbg("_decode_jwt_exp: invalid parts count=%d", len(parts))
+        _, _, rest = token.encode("ascii").partition(b".")
+        payload_b64, sep, sig = rest.partition(b".")
+        if not sep or b"." in sig:
+            _dbg("_decode_jwt_exp: malformed token")
             return None
-        def _b64fix(s: str) -> bytes:
-            s += "=" * (-len(s) % 4)
-            return base64.urlsafe_b64decode(s.encode("utf-8"))
-        payload_raw = _b64fix(parts[1])
-        payload = json.loads(payload_raw.decode("utf-8"))
+        payload_raw = _b64fix(payload_b64)
+        payload = orjson.loads(payload_raw)
         exp = payload.get("exp")
         if isinstance(exp, (int, float)):
             _dbg("_decode_jwt_exp: exp=%s", exp)
             return float(exp)
         return None
     except Exception:
-        _dbg("_decode_jwt_exp: failed to decode token=%s", _redact(token))
+        if DEBUG:
+            _dbg("_decode_jwt_exp: failed to decode token=%s", _redact(token))
         return None
 
 
@@ -801,6 +939,87 @@ DEFAULT_UA_FIREFOX = (
 )
 
 
+class _PlaywrightState:
+    def __init__(self) -> None:
+        self.pw: Optional[Playwright] = None
+        self.browser: Optional[Browser] = None
+        self.proxy: Optional[str] = None
+        self.lock = asyncio.Lock()
+
+    async def get_browser(self, proxy: Optional[str]) -> Browser:
+        async with self.lock:
+            if self.browser is not None and (self.proxy != proxy or not self.browser.is_connected()):
+                _dbg("_PlaywrightState: relaunching browser proxy=%s", bool(proxy))
+                await self._close_browser()
+            if self.pw is None:
+                self.pw = await async_playwright().start()
+            if self.browser is None:
+                launch_kwargs: Dict[str, Any] = {"headless": True}
+                if proxy:
+                    launch_kwargs["proxy"] = {"server": proxy}
+                _dbg("_PlaywrightState: launching chromium headless proxy=%s", bool(proxy))
+                self.browser = await self.pw.chromium.launch(**launch_kwargs)
+                self.proxy = proxy
+            return self.browser
+
+    async def _close_browser(self) -> None:
+        browser, self.browser = self.browser, None
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+
+    async def aclose(self) -> None:
+        async with self.lock:
+            await self._close_browser()
+            pw, self.pw = self.pw, None
+            if pw is not None:
+                try:
+                    await pw.stop()
+                except Exception:
+                    pass
+
+
+_PW_STATE = _PlaywrightState()
+
+SENTINEL_SDK_URL = "https://chatgpt.com/sentinel/97790f37/sdk.js"
+_SENTINEL_SDK_READY_JS = (
+    "() => (typeof window.SentinelSDK !== 'undefined' && typeof window.SentinelSDK.token === 'function')"
+)
+_BLANK_HTML = "<!doctype html><html><head></head><body></body></html>"
+
+SENTINEL_SAFETY_MARGIN_SEC = 30.0
+
+_SENTINEL_CACHE: Dict[Tuple[str, str], Tuple[str, Optional[float]]] = {}
+_SENTINEL_LOCKS: "defaultdict[Tuple[str, str], asyncio.Lock]" = defaultdict(asyncio.Lock)
+
+
+def _sentinel_usable(exp: Optional[float]) -> bool:
+    return exp is None or exp - time.time() > SENTINEL_SAFETY_MARGIN_SEC
+
+
+def _cached_sentinel(flow: str, device_id: str) -> Optional[Tuple[str, Optional[float]]]:
+    entry = _SENTINEL_CACHE.get((flow, device_id))
+    if entry is not None and _sentinel_usable(entry[1]):
+        return entry
+    return None
+
+
+def _drop_cached_sentinel(flow: str, device_id: str) -> None:
+    _SENTINEL_CACHE.pop((flow, device_id), None)
+
+
+def _sentinel_token_exp(token_obj: Mapping[str, Any]) -> Optional[float]:
+    for key in ("token", "sentinel_token", "jwt"):
+        inner = token_obj.get(key)
+        if isinstance(inner, str):
+            exp = _decode_jwt_exp(inner)
+            if exp:
+                return exp
+    return None
+
+
 async def get_sentinel_token_via_playwright(
     cookies: Union[str, Mapping[str, str], Iterable[Mapping[str, Any]]],
     *,
@@ -809,14 +1028,65 @@ async def get_sentinel_token_via_playwright(
     flow: str = "sora_2_create_task",
     timeout_ms: int = 7000,
     proxy: Optional[str] = None,
-) -> str:
+    fast_mint: bool = True,
+) -> Tuple[str, Optional[float]]:
+    entry = _cached_sentinel(flow, device_id)
+    if entry is not None:
+        _dbg("get_sentinel_token_via_playwright: cache hit flow=%s", flow)
+        return entry
+    async with _SENTINEL_LOCKS[(flow, device_id)]:
+        entry = _cached_sentinel(flow, device_id)
+        if entry is None:
+            entry = await _mint_sentinel_token(
+                cookies,
+                device_id=device_id,
+                user_agent=user_agent,
+                flow=flow,
+                timeout_ms=timeout_ms,
+                proxy=proxy,
+                fast_mint=fast_mint,
+            )
+            _SENTINEL_CACHE[(flow, device_id)] = entry
+    return entry
+
+
+async def _fast_load_sentinel_sdk(page: Any, timeout_ms: int) -> bool:
+    profile_url = f"{SORA_BASE}/profile"
+
+    async def _serve_blank(route: Any) -> None:
+        await route.fulfill(status=200, content_type="text/html", body=_BLANK_HTML)
+
+    await page.route(profile_url, _serve_blank)
+    try:
+        _dbg("get_sentinel_token_via_playwright: fast mint via blank %s", profile_url)
+        await page.goto(profile_url, wait_until="domcontentloaded")
+        await page.add_script_tag(url=SENTINEL_SDK_URL)
+        await page.wait_for_function(_SENTINEL_SDK_READY_JS, timeout=timeout_ms)
+        return True
+    except Exception as e:
+        _dbg("get_sentinel_token_via_playwright: fast mint failed: %r", e)
+        return False
+    finally:
+        await page.unroute(profile_url, _serve_blank)
+
+
+async def _mint_sentinel_token(
+    cookies: Union[str, Mapping[str, str], Iterable[Mapping[str, Any]]],
+    *,
+    device_id: str,
+    user_agent: Optional[str],
+    flow: str,
+    timeout_ms: int,
+    proxy: Optional[str],
+    fast_mint: bool,
+) -> Tuple[str, Optional[float]]:
     _dbg(
         "get_sentinel_token_via_playwright: flow=%s timeout_ms=%s proxy=%s",
         flow, timeout_ms, proxy or "-",
     )
     if isinstance(cookies, str):
         try:
-            cookies_obj: Any = json.loads(cookies)
+            cookies_obj: Any = orjson.loads(cookies)
         except Exception:
             cookies_obj = cookies
     else:
@@ -873,36 +1143,25 @@ async def get_sentinel_token_via_playwright(
 
     ua = user_agent or DEFAULT_HEADERS.get("user-agent") or DEFAULT_UA_FIREFOX
 
-    async with async_playwright() as p:
-        launch_kwargs: Dict[str, Any] = {"headless": True}
-        if proxy and isinstance(proxy, str) and proxy.strip():
-            launch_kwargs["proxy"] = {"server": proxy}
-        _dbg("get_sentinel_token_via_playwright: launching chromium headless proxy=%s", bool(launch_kwargs.get("proxy")))
-        browser = await p.chromium.launch(**launch_kwargs)
-        ctx = await browser.new_context(user_agent=ua)
+    browser = await _PW_STATE.get_browser(proxy.strip() if isinstance(proxy, str) and proxy.strip() else None)
+    ctx = await browser.new_context(user_agent=ua)
+    try:
         await ctx.add_cookies(pw_cookies)
         page = await ctx.new_page()
 
-        _dbg("get_sentinel_token_via_playwright: goto %s/profile", SORA_BASE)
-        await page.goto(f"{SORA_BASE}/profile", wait_until="domcontentloaded")
-        try:
-            await page.wait_for_function(
-                "() => (typeof window.SentinelSDK !== 'undefined' && typeof window.SentinelSDK.token === 'function')",
-                timeout=timeout_ms,
-            )
-        except Exception:
+        if not (fast_mint and await _fast_load_sentinel_sdk(page, timeout_ms)):
+            _dbg("get_sentinel_token_via_playwright: goto %s/profile", SORA_BASE)
+            await page.goto(f"{SORA_BASE}/profile", wait_until="domcontentloaded")
             try:
-                _dbg("get_sentinel_token_via_playwright: inject sdk.js and wait")
-                await page.add_script_tag(url="https://chatgpt.com/sentinel/97790f37/sdk.js")
-                await page.wait_for_function(
-                    "() => (typeof window.SentinelSDK !== 'undefined' && typeof window.SentinelSDK.token === 'function')",
-                    timeout=timeout_ms,
-                )
-            except Exception as e:
-                _dbg("get_sentinel_token_via_playwright: sdk unavailable: %r", e)
-                await ctx.close()
-                await browser.close()
-                raise RuntimeError(f"Sentinel SDK not available: {e}")
+                await page.wait_for_function(_SENTINEL_SDK_READY_JS, timeout=timeout_ms)
+            except Exception:
+                try:
+                    _dbg("get_sentinel_token_via_playwright: inject sdk.js and wait")
+                    await page.add_script_tag(url=SENTINEL_SDK_URL)
+                    await page.wait_for_function(_SENTINEL_SDK_READY_JS, timeout=timeout_ms)
+                except Exception as e:
+                    _dbg("get_sentinel_token_via_playwright: sdk unavailable: %r", e)
+                    raise RuntimeError(f"Sentinel SDK not available: {e}")
 
         token_obj = await page.evaluate(
             "(flow) => window.SentinelSDK.token(flow)",
@@ -911,18 +1170,18 @@ async def get_sentinel_token_via_playwright(
 
         if isinstance(token_obj, Mapping):
             out = dict(token_obj)
-            out["flow"] = flow
-            out["id"] = device_id
-            token_str = json.dumps(out, separators=(",", ":"))
         else:
             try:
-                base_obj = json.loads(token_obj) if isinstance(token_obj, str) else {}
+                out = orjson.loads(token_obj) if isinstance(token_obj, str) else {}
             except Exception:
-                base_obj = {}
-            base_obj.update({"flow": flow, "id": device_id})
-            token_str = json.dumps(base_obj, separators=(",", ":"))
-
+                out = {}
+            if not isinstance(out, dict):
+                out = {}
+        out["flow"] = flow
+        out["id"] = device_id
+        token_str = orjson.dumps(out).decode()
+    finally:
         await ctx.close()
-        await browser.close()
+    if DEBUG:
         _dbg("get_sentinel_token_via_playwright: token=%s", _redact(token_str))
-        return token_str
\ No newline at end of file
+    return token_str, _sentinel_token_exp(out)
\ No newline at end of file